@@ -2,9 +2,10 @@
 # Execute a stepchain job: extract request+PSets tarball, set up CMSSW per step,
 # apply precomputed PSet tweaks (from job file), run cmsRun.
 #
-# Usage: execute_stepchain.sh <request_psets.tar.gz> <job_N.json>
+# Usage: execute_stepchain.sh <request_psets.tar[.gz|.zst]> <job_N.json>
 #
 # Tarball contains request.json and PSets/ (from event_splitter). job_N.json is per job.
+# Compression of the tarball is picked from its suffix (.tar.zst needs zstd on the worker).
 #
 # Intended to be executed on Grid worker nodes where the CMS environment is available (see setup_cmsset call).
 
@@ -30,7 +31,7 @@ EXIT_STAGEOUT=60324          # Other stageout exception
 # Parse argv and validate; sets TARBALL_PATH and JOB_FILE (absolute), exits on error.
 parse_and_validate_args() {
     if [ "$#" -ne 2 ]; then
-        echo "[execute_stepchain] Usage: $(basename "$0") <request_psets.tar.gz> <job_N.json>"
+        echo "[execute_stepchain] Usage: $(basename "$0") <request_psets.tar[.gz|.zst]> <job_N.json>"
         exit $EXIT_INVALID_ARGS
     fi
     TARBALL_PATH=$(resolve_abs "$1")
@@ -158,14 +159,19 @@ import json, os, sys
 job = json.load(open(os.environ['JOB_FILE']))
 step_num = int(os.environ['STEP_NUM'])
 copy_idx = os.environ.get('COPY_IDX', '')
-if copy_idx != '':
-    tweak = job['tweaks']['1'][int(copy_idx)]
+# tweaks is a list (tweaks[0] = step 1); older job files use a dict keyed by '1', '2', ...
+tweaks = job.get('tweaks')
+if isinstance(tweaks, dict):
+    tweak = tweaks.get(str(step_num))
+elif isinstance(tweaks, list) and 0 < step_num <= len(tweaks):
+    tweak = tweaks[step_num - 1]
 else:
-    sk = str(step_num)
-    if 'tweaks' not in job or sk not in job['tweaks']:
-        print('[execute_stepchain] Precomputed tweak for step %s not found' % step_num, file=sys.stderr)
-        sys.exit(1)
-    tweak = job['tweaks'][sk]
+    tweak = None
+if tweak is None:
+    print('[execute_stepchain] Precomputed tweak for step %s not found' % step_num, file=sys.stderr)
+    sys.exit(1)
+if copy_idx != '':
+    tweak = tweak[int(copy_idx)]
 with open('tweak.json', 'w') as f:
     json.dump(tweak, f, indent=2)
 "
@@ -251,7 +257,11 @@ trap cleanup EXIT
 cd "$TMP_DIR"
 
 echo "[execute_stepchain] Extracting $TARBALL_PATH"
-tar -xzf "$TARBALL_PATH"
+case "$TARBALL_PATH" in
+    *.tar.zst) zstd -dc "$TARBALL_PATH" | tar -xf - ;;
+    *.tar)     tar -xf "$TARBALL_PATH" ;;
+    *)         tar -xzf "$TARBALL_PATH" ;;
+esac
 if [ ! -f "request.json" ] || [ ! -d "PSets" ]; then
     echo "[execute_stepchain] Error: tarball must contain request.json and PSets/"
     exit $EXIT_MISSING_INPUT
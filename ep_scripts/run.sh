@@ -3,7 +3,7 @@
 touch prmon.txt prmon.json
 
 # Run stepchain in background so we can monitor it with prmon
-./execute_stepchain.sh request_psets.tar.gz job*.json &
+./execute_stepchain.sh request_psets.tar* job*.json &
 PID=$!
 
 # Profile memory usage; || true so prmon failure (e.g. not found) does not abort the job
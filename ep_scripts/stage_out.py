@@ -8,70 +8,204 @@ Either pass explicit file pairs (--lfn / --local) or discover from a stepchain r
 (--request + --work-dir).
 """
 import argparse
+import glob
+import hashlib
 import json
 # import logging
 import os
+import random
+import stat
 import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # logging.basicConfig(level=logging.INFO)
 # utils.py is transferred alongside stage_out.py (same dir)
 _script_dir = os.path.dirname(os.path.abspath(__file__))
 if _script_dir not in sys.path:
     sys.path.insert(0, _script_dir)
-from utils import build_lfn
+from utils import build_lfn, load_json
 
 from WMCore.Storage.StageOutMgr import StageOutMgr
 
+# Upper bound for concurrent transfers from a single worker node
+MAX_WORKERS = 8
+
+# Upper bound for concurrent step directory probes in discover_files_from_request
+MAX_PROBE_WORKERS = 4
+
+# Retry backoff (seconds): min(RETRY_CAP, RETRY_BASE * 2**attempt) + uniform(0, RETRY_JITTER)
+RETRY_BASE = 30
+RETRY_CAP = 1800
+RETRY_JITTER = 10
+
+# Read size when computing checksums of local files (--compute-cksum)
+CKSUM_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Files above this size are transferred with --parallel-parts streams (when > 1)
+PARALLEL_MIN_SIZE = 1 << 30
+
+# Per-file parallel TCP streams option, by WMCore stage-out command
+STREAMS_OPTIONS = {
+    "gfal2": "--nbstreams %d",
+    "xrdcp": "--streams %d",
+}
+
+# Idle StageOutMgr instances, reused across stageout_files() calls in the same process
+# so that site-local-config.xml / storage.json are parsed once per manager, not per call
+_manager_pool = []
+_manager_pool_lock = threading.Lock()
+
 
 def discover_files_from_request(request_path, work_dir):
     """
     Discover (lfn, local_path) pairs for steps with KeepOutput=true from a stepchain request.
 
+    Steps are probed concurrently (up to MAX_PROBE_WORKERS) when there are more than two,
+    so that filesystem latency does not add up across steps; results keep step order.
+
     Returns list of dicts with 'lfn' and 'local_path'.
     """
     if not os.path.isfile(request_path):
         return []
-    with open(request_path) as f:
-        req = json.load(f)
+    req = load_json(request_path)
     num_steps = req.get("StepChain", 1)
     base = req.get("UnmergedLFNBase", "/store/unmerged")
-    result = []
-    for n in range(1, num_steps + 1):
+
+    def probe_step(n):
         step_key = "Step%d" % n
         step = req.get(step_key, {})
         if not step.get("KeepOutput", False):
-            continue
+            return None
         step_dir = os.path.join(work_dir, "step%d" % n)
         if n < num_steps:
             next_step = req.get("Step%d" % (n + 1), {})
             out_module = next_step.get("InputFromOutputModule", "RAWSIMoutput")
         else:
             # Last step: no next step to get InputFromOutputModule from.
-            # Scan step_dir for .root files and use the first one's basename (without .root)
-            # as the output module name (e.g. NANOAODSIMoutput.root -> NANOAODSIMoutput).
-            out_module = None
-            if os.path.isdir(step_dir):
-                for f in os.listdir(step_dir):
-                    if f.endswith(".root"):
-                        out_module = f[:-5]
-                        break
+            # Use the first regular .root file in step_dir (lazy glob, stops at the first
+            # match); its basename without .root is the output module name
+            # (e.g. NANOAODSIMoutput.root -> NANOAODSIMoutput).
+            root_file = next((path for path in glob.iglob(os.path.join(glob.escape(step_dir), "*.root"))
+                              if os.path.isfile(path)), None)
+            out_module = os.path.basename(root_file)[:-5] if root_file else None
         if not out_module:
             print("[stage_out] Skipping step%d: could not determine output module" % n)
-            continue
+            return None
         local_path = os.path.join(step_dir, out_module + ".root")
-        if not os.path.isfile(local_path):
-            print("[stage_out] Skipping step%d: file not found: %s" % (n, local_path))
-            continue
+        if n < num_steps:
+            # Single stat on the expected file (no separate isdir/listdir/isfile)
+            try:
+                found = stat.S_ISREG(os.stat(local_path).st_mode)
+            except OSError:
+                found = False
+            if not found:
+                print("[stage_out] Skipping step%d: file not found: %s" % (n, local_path))
+                return None
         era = step.get("AcquisitionEra", "")
         primary = step.get("PrimaryDataset", "")
         proc = step.get("ProcessingString", "")
         lfn = build_lfn(base, era, primary, proc, out_module)
         step_name = "step%d" % n
-        result.append({"lfn": lfn, "local_path": local_path, "step_name": step_name})
-    return result
+        return {"lfn": lfn, "local_path": local_path, "step_name": step_name}
+
+    steps = range(1, num_steps + 1)
+    if num_steps <= 2:
+        probed = [probe_step(n) for n in steps]
+    else:
+        with ThreadPoolExecutor(max_workers=min(num_steps, MAX_PROBE_WORKERS)) as executor:
+            probed = list(executor.map(probe_step, steps))
+    return [r for r in probed if r is not None]
 
 
-def stageout_files(file_list, retries=3, retry_pause=600):
+def _acquire_manager():
+    """Take an idle StageOutMgr from the pool (or create one), with per-call state cleared."""
+    with _manager_pool_lock:
+        manager = _manager_pool.pop() if _manager_pool else None
+    if manager is None:
+        # StageOutMgr loads site-local-config.xml from SITECONFIG_PATH/JobConfig/site-local-config.xml
+        # and storage.json automatically (via initialiseSiteConf)
+        manager = StageOutMgr()
+    # Retries are driven by stage_one with backoff, not by WMCore: no retries and no
+    # pause (StageOutImpl sleeps retryPause after every failed attempt, even the last)
+    manager.numberOfRetries = 0
+    manager.retryPauseTime = 0
+    manager.completedFiles = {}
+    manager.failed = {}
+    return manager
+
+
+def _release_manager(manager):
+    """Return a StageOutMgr to the pool for the next stageout_files() call."""
+    with _manager_pool_lock:
+        _manager_pool.append(manager)
+
+
+def compute_checksum(path, algorithm):
+    """
+    Checksum of a local file as a hex string: adler32 (8 hex digits, as expected by the
+    WMCore gfal2/xrdcp backends) or any hashlib algorithm (e.g. md5).
+    """
+    with open(path, "rb") as f:
+        if algorithm == "adler32":
+            value = 1
+            for chunk in iter(lambda: f.read(CKSUM_CHUNK_SIZE), b""):
+                value = zlib.adler32(chunk, value)
+            return "%08x" % value
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: reads and hashes in C
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        digest = hashlib.new(algorithm)
+        for chunk in iter(lambda: f.read(CKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _with_streams(stage_out, streams):
+    """Copy of a stage-out definition (command/option dict) with the parallel streams option added."""
+    fmt = STREAMS_OPTIONS.get(stage_out.get("command"))
+    if fmt is None:
+        return stage_out
+    option = stage_out.get("option")
+    extra = fmt % streams
+    return dict(stage_out, option="%s %s" % (option, extra) if option else extra)
+
+
+def stage_with_streams(manager, fileToStage, streams):
+    """
+    Call manager(fileToStage) with the parallel streams option temporarily added to its
+    gfal2/xrdcp stage-outs. The manager's own definitions are swapped out, not modified,
+    so other managers sharing the parsed site config are unaffected.
+    """
+    if manager.override:
+        saved = manager.overrideConf
+        manager.overrideConf = _with_streams(saved, streams)
+        try:
+            return manager(fileToStage)
+        finally:
+            manager.overrideConf = saved
+    saved = manager.stageOuts_rfcs
+    manager.stageOuts_rfcs = [(_with_streams(so, streams), rfc) for so, rfc in saved]
+    try:
+        return manager(fileToStage)
+    finally:
+        manager.stageOuts_rfcs = saved
+
+
+def backoff_delay(attempt, base=RETRY_BASE, cap=RETRY_CAP, jitter=RETRY_JITTER):
+    """
+    Seconds to wait before retry number attempt+1 (attempt is 0-based).
+
+    Exponential backoff capped at cap, plus random jitter so that many jobs failing
+    against the same SE at once do not all reconnect at the same time.
+    """
+    return min(cap, base * 2 ** attempt) + random.uniform(0, jitter)
+
+
+def stageout_files(file_list, retries=3, workers=4,
+                   retry_base=RETRY_BASE, retry_cap=RETRY_CAP, retry_jitter=RETRY_JITTER,
+                   compute_cksum="none", parallel_parts=1):
     """
     Stage out files using WMCore StageOutMgr.
 
@@ -79,46 +213,133 @@ def stageout_files(file_list, retries=3, retry_pause=600):
         - 'LFN': logical file name (e.g. /store/unmerged/.../file.root)
         - 'PFN': local physical path (e.g. step6/NANOAODSIMoutput.root or file:...)
         - 'Checksums': optional dict with checksums
+    retries: number of retries per file after the first attempt, spaced by backoff_delay()
+    workers: number of files transferred concurrently (capped at MAX_WORKERS)
+    compute_cksum: "none", or a checksum algorithm (adler32, md5) computed locally for files
+        without 'checksums' and passed to StageOutMgr (the WMCore backends verify adler32)
+    parallel_parts: number of parallel streams for files larger than PARALLEL_MIN_SIZE
+        (1 = disabled); falls back to a single stream if such a transfer fails
 
-    Returns: list of updated file dicts with 'PFN' (destination), 'PNN', 'StageOutCommand'
+    Returns: list of updated file dicts with 'PFN' (destination), 'PNN', 'StageOutCommand',
+    in the same order as file_list
     """
-    # StageOutMgr loads site-local-config.xml from SITECONFIG_PATH/JobConfig/site-local-config.xml
-    # and storage.json automatically (via initialiseSiteConf)
-    manager = StageOutMgr()
-    manager.numberOfRetries = retries
-    manager.retryPauseTime = retry_pause
-
-    staged_files = []
-    for file_info in file_list:
+    workers = max(1, min(workers, MAX_WORKERS, len(file_list)))
+
+    # StageOutMgr keeps per-transfer state (completedFiles) that is not thread-safe,
+    # so each worker thread gets its own manager from the pool. All of them are kept
+    # for cleanup and returned to the pool at the end of the call.
+    local = threading.local()
+    managers = []
+    managers_lock = threading.Lock()
+    # Set once a file has failed for good: the call fails anyway, so in-flight
+    # transfers stop retrying instead of sitting out their backoff schedule
+    abort = threading.Event()
+
+    def get_manager():
+        manager = getattr(local, "manager", None)
+        if manager is None:
+            manager = _acquire_manager()
+            local.manager = manager
+            with managers_lock:
+                managers.append(manager)
+        return manager
+
+    def prepare_one(file_info):
         # Prepare file dict (PFN is local path; StageOutMgr will update it to destination PFN)
         local_path = file_info['local_path'].replace('file:', '')
         file_size = os.path.getsize(local_path) if os.path.isfile(local_path) else 0
+        checksums = file_info.get('checksums')
+        if not checksums and compute_cksum != "none":
+            checksums = {compute_cksum: compute_checksum(local_path, compute_cksum)}
+        # Leave out unset keys (notably Checksums) rather than passing None;
+        # StageOutMgr fills in PFN/PNN/StageOutCommand on success
+        fileToStage = {k: v for k, v in (
+            ('LFN', file_info['lfn']),
+            ('PFN', local_path),
+            ('Checksums', checksums),
+        ) if v is not None}
+        return fileToStage, file_size
+
+    def stage_one(file_info, prepared):
+        # Wait for prepare_one (run ahead on the prep thread) to finish with this file
+        fileToStage, file_size = prepared.result()
+        # Do not start a transfer that would only be cleaned up again
+        if abort.is_set():
+            raise RuntimeError("Not staging out %s: another file already failed" % file_info['lfn'])
         size_mb = file_size / (1024 * 1024)
         print("[stage_out] Staging out: %s (%.2f MB)" % (file_info['lfn'], size_mb))
 
-        fileToStage = {
-            'LFN': file_info['lfn'],
-            'PFN': local_path,
-            'PNN': None,
-            'StageOutCommand': None,
-            'Checksums': file_info.get('checksums'),
-        }
+        streams = parallel_parts if parallel_parts > 1 and file_size > PARALLEL_MIN_SIZE else 1
+        manager = get_manager()
+        for attempt in range(retries + 1):
+            try:
+                if streams > 1:
+                    try:
+                        result = stage_with_streams(manager, fileToStage, streams)
+                        break
+                    except Exception as ex:
+                        print("[stage_out] Stage-out with %d streams failed for %s: %s; "
+                              "falling back to a single stream" % (streams, file_info['lfn'], ex),
+                              file=sys.stderr)
+                        streams = 1
+                # Call manager - it will try each stage-out from site config until one succeeds
+                result = manager(fileToStage)
+                break
+            except Exception as ex:
+                if attempt == retries:
+                    print("[stage_out] Stage-out failed for %s: %s" % (file_info['lfn'], ex), file=sys.stderr)
+                    abort.set()
+                    raise
+                if abort.is_set():
+                    print("[stage_out] Not retrying %s: another file already failed" % file_info['lfn'],
+                          file=sys.stderr)
+                    raise
+                delay = backoff_delay(attempt, retry_base, retry_cap, retry_jitter)
+                print("[stage_out] Stage-out attempt %d/%d failed for %s: %s; retrying in %.1f s" % (
+                    attempt + 1, retries + 1, file_info['lfn'], ex, delay
+                ), file=sys.stderr)
+                # Sleep out the backoff, but wake up as soon as another file has failed
+                if abort.wait(delay):
+                    print("[stage_out] Not retrying %s: another file already failed" % file_info['lfn'],
+                          file=sys.stderr)
+                    raise
+        print("[stage_out] Staged out: %s -> %s (PNN: %s, Command: %s)" % (
+            file_info['local_path'],
+            result['PFN'],
+            result['PNN'],
+            result['StageOutCommand']
+        ))
+        return result
 
-        try:
-            # Call manager - it will try each stage-out from site config until one succeeds
-            result = manager(fileToStage)
-            staged_files.append(result)
-            print("[stage_out] Staged out: %s -> %s (PNN: %s, Command: %s)" % (
-                file_info['local_path'],
-                result['PFN'],
-                result['PNN'],
-                result['StageOutCommand']
-            ))
-        except Exception as ex:
-            print("[stage_out] Stage-out failed for %s: %s" % (file_info['lfn'], ex), file=sys.stderr)
-            # Optionally clean up successful transfers if one fails
-            manager.cleanSuccessfulStageOuts()
-            raise
+    staged_files = [None] * len(file_list)
+    try:
+        # File preparation (size, optional checksum) runs in order on its own thread, so
+        # that the next files are ready while the current ones are being transferred
+        with ThreadPoolExecutor(max_workers=1) as prep_executor, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            prepared = [prep_executor.submit(prepare_one, fi) for fi in file_list]
+            futures = {
+                executor.submit(stage_one, fi, prepared[idx]): idx
+                for idx, fi in enumerate(file_list)
+            }
+            try:
+                for future in as_completed(futures):
+                    staged_files[futures[future]] = future.result()
+            except Exception:
+                abort.set()
+                # Drop queued preparations/transfers and wait for in-flight ones, so that every
+                # file that made it to the SE is known to some manager before cleaning up
+                for future in prepared:
+                    future.cancel()
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                for manager in managers:
+                    manager.cleanSuccessfulStageOuts()
+                raise
+    finally:
+        for manager in managers:
+            _release_manager(manager)
 
     return staged_files
 
@@ -177,12 +398,48 @@ def main():
     )
     ap.add_argument("--retries", type=int, default=3, help="Number of retries (default: 3)")
     ap.add_argument(
-        "--retry-pause",
+        "--retry-base",
+        type=float,
+        default=RETRY_BASE,
+        help="Backoff before the first retry, doubled on each retry (default: %d s)" % RETRY_BASE,
+    )
+    ap.add_argument(
+        "--retry-cap",
+        type=float,
+        default=RETRY_CAP,
+        help="Maximum backoff between retries (default: %d s)" % RETRY_CAP,
+    )
+    ap.add_argument(
+        "--retry-jitter",
+        type=float,
+        default=RETRY_JITTER,
+        help="Random jitter added to each backoff (default: up to %d s)" % RETRY_JITTER,
+    )
+    ap.add_argument(
+        "--workers",
         type=int,
-        default=600,
-        help="Seconds between retries (default: 600)",
+        default=4,
+        help="Number of files staged out concurrently (default: 4, max: %d)" % MAX_WORKERS,
+    )
+    ap.add_argument(
+        "--compute-cksum",
+        choices=["none", "adler32", "md5"],
+        default="none",
+        help="Compute this checksum of each local file and pass it to StageOutMgr "
+        "(WMCore verifies adler32 after the transfer; default: none)",
+    )
+    ap.add_argument(
+        "--parallel-parts",
+        type=int,
+        default=1,
+        help="Parallel streams for files over 1 GiB (gfal2 --nbstreams / xrdcp --streams; "
+        "default: 1, disabled)",
     )
     args = ap.parse_args()
+    if args.workers < 1:
+        ap.error("--workers must be at least 1")
+    if args.parallel_parts < 1:
+        ap.error("--parallel-parts must be at least 1")
 
     if args.request is not None:
         if args.work_dir is None:
@@ -208,7 +465,16 @@ def main():
     ):
         ap.error("SITECONFIG_PATH or WMAGENT_SITE_CONFIG_OVERRIDE must be set")
 
-    staged = stageout_files(file_list, retries=args.retries, retry_pause=args.retry_pause)
+    staged = stageout_files(
+        file_list,
+        retries=args.retries,
+        workers=args.workers,
+        retry_base=args.retry_base,
+        retry_cap=args.retry_cap,
+        retry_jitter=args.retry_jitter,
+        compute_cksum=args.compute_cksum,
+        parallel_parts=args.parallel_parts,
+    )
 
     if args.work_dir:
         write_stage_out_results(staged, args.work_dir, file_list)
@@ -5,6 +5,7 @@ import math
 import pprint
 import os
 import shutil
+import sys
 import tarfile
 
 from WMCore.DataStructs.File import File as DSFile
@@ -13,6 +14,29 @@ from WMCore.DataStructs.Subscription import Subscription
 from WMCore.DataStructs.Run import Run
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
 
+# src/python is not on sys.path when this file is run as a script
+_python_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _python_dir not in sys.path:
+    sys.path.insert(0, _python_dir)
+from micro_agent.utils import load_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# request_psets tarball suffix per --compression choice
+TARBALL_SUFFIXES = {
+    "none": ".tar",
+    "gzip": ".tar.gz",
+    "zstd": ".tar.zst",
+}
+
 
 def _mask_get_max_events(mask):
     """Return max events from mask (LastEvent - FirstEvent + 1) or None."""
@@ -28,9 +52,7 @@ def _mask_get_run_and_lumis(mask):
     return mask.get("runAndLumis", {})
 
 
-def build_job_tweak_json(
-    mask,
-    lhe_input=False,
+def build_step_tweak_parts(
     chain_input_file=None,
     chain_input_files=None,
     set_output_filename=None,
@@ -39,25 +61,54 @@ def build_job_tweak_json(
     event_streams=0,
 ):
     """
-    Build a dict of PSet parameter key -> value string (customTypeCms.* format)
-    for edm_pset_tweak.py (cmssw-wm-tools). Matches WMCore PSetTweaks/WMTweak.makeJobTweak logic.
+    Build the job-independent parts of a step tweak: (head, tail) dicts that go
+    before and after build_mask_tweak(mask) (see build_job_tweak_json).
 
-    num_threads: number of threads for cmsRun (process.options.numberOfThreads).
-    When step1 has numCopies > 1, each copy uses 1 thread (parallel processes).
-    Otherwise use job CPUs (e.g. req["Multicore"]) so cmsRun uses all cores.
-    event_streams: numberOfStreams for cmsRun (0 = use CMSSW default). From request.json EventStreams.
+    head: threads/streams. tail: chained input files (which force maxEvents = -1)
+    and the output module fileName.
     """
-    tweak = {}
-
+    head = {}
     # CPU/threads tweak (matches WMCore SetupCMSSWPset.makeThreadsStreamsTweak)
-    tweak["process.options.numberOfThreads"] = (
+    head["process.options.numberOfThreads"] = (
         "customTypeCms.untracked.uint32(%s)" % num_threads
     )
     # numberOfStreams: 0 = use CMSSW default (matches WMCore when eventStreams not set)
-    tweak["process.options.numberOfStreams"] = (
+    head["process.options.numberOfStreams"] = (
         "customTypeCms.untracked.uint32(%s)" % int(event_streams)
     )
 
+    tail = {}
+    if chain_input_files:
+        tail["process.source.fileNames"] = (
+            "customTypeCms.untracked.vstring([%s])"
+            % ", ".join(repr(f) for f in chain_input_files)
+        )
+        tail["process.maxEvents"] = (
+            "customTypeCms.untracked.PSet(input=cms.untracked.int32(-1))"
+        )
+    elif chain_input_file:
+        tail["process.source.fileNames"] = (
+            "customTypeCms.untracked.vstring([%r])" % chain_input_file
+        )
+        tail["process.maxEvents"] = (
+            "customTypeCms.untracked.PSet(input=cms.untracked.int32(-1))"
+        )
+
+    if set_output_filename and output_module_name:
+        tail["process.%s.fileName" % output_module_name] = (
+            "customTypeCms.untracked.string(%r)" % set_output_filename
+        )
+
+    return head, tail
+
+
+def build_mask_tweak(mask):
+    """
+    Build the mask-dependent part of a step tweak (first lumi/event/run, maxEvents,
+    lumisToProcess). It is the same for every step of a job.
+    """
+    tweak = {}
+
     first_lumi = mask.get("FirstLumi")
     if first_lumi is not None:
         tweak["process.source.firstLuminosityBlock"] = (
@@ -99,28 +150,38 @@ def build_job_tweak_json(
             % lumis_to_process
         )
 
-    if chain_input_files:
-        tweak["process.source.fileNames"] = (
-            "customTypeCms.untracked.vstring([%s])"
-            % ", ".join(repr(f) for f in chain_input_files)
-        )
-        tweak["process.maxEvents"] = (
-            "customTypeCms.untracked.PSet(input=cms.untracked.int32(-1))"
-        )
-    elif chain_input_file:
-        tweak["process.source.fileNames"] = (
-            "customTypeCms.untracked.vstring([%r])" % chain_input_file
-        )
-        tweak["process.maxEvents"] = (
-            "customTypeCms.untracked.PSet(input=cms.untracked.int32(-1))"
-        )
+    return tweak
 
-    if set_output_filename and output_module_name:
-        tweak["process.%s.fileName" % output_module_name] = (
-            "customTypeCms.untracked.string(%r)" % set_output_filename
-        )
 
-    return tweak
+def build_job_tweak_json(
+    mask,
+    lhe_input=False,
+    chain_input_file=None,
+    chain_input_files=None,
+    set_output_filename=None,
+    output_module_name=None,
+    num_threads=1,
+    event_streams=0,
+):
+    """
+    Build a dict of PSet parameter key -> value string (customTypeCms.* format)
+    for edm_pset_tweak.py (cmssw-wm-tools). Matches WMCore PSetTweaks/WMTweak.makeJobTweak logic.
+
+    num_threads: number of threads for cmsRun (process.options.numberOfThreads).
+    When step1 has numCopies > 1, each copy uses 1 thread (parallel processes).
+    Otherwise use job CPUs (e.g. req["Multicore"]) so cmsRun uses all cores.
+    event_streams: numberOfStreams for cmsRun (0 = use CMSSW default). From request.json EventStreams.
+    """
+    head, tail = build_step_tweak_parts(
+        chain_input_file=chain_input_file,
+        chain_input_files=chain_input_files,
+        set_output_filename=set_output_filename,
+        output_module_name=output_module_name,
+        num_threads=num_threads,
+        event_streams=event_streams,
+    )
+    # tail may override maxEvents from the mask; the key keeps its position
+    return {**head, **build_mask_tweak(mask), **tail}
 
 
 class DummyWorkflow:
@@ -186,38 +247,55 @@ def make_subscription(fileset, split_algo, task_type, workflow_name, task_name):
     return sub
 
 
-def generate_eventbased_jobs(request_json_path, splitting_json_path):
+def eventbased_mc_masks(first_event, total_events, first_lumi, events_per_job, events_per_lumi):
     """
-    High-level driver:
-      - read request + splitting docs
-      - build an in-memory subscription for the Step1 production task
-      - call EventBased splitting via SplitterFactory
-      - return a flat list of job dicts, each with job_index and tweaks
-        (PSetTweak JSON per step for edm_pset_tweak on the worker).
-    """
-    with open(request_json_path) as f:
-        req = json.load(f)
-    with open(splitting_json_path) as f:
-        splitting_info = json.load(f)
-
-    # Require main request keys for a stepchain
-    for key in ("Step1", "StepChain", "TimePerEvent", "Memory", "PrepID"):
-        if key not in req:
-            raise RuntimeError("Request JSON missing required key: %s" % key)
-    if "Step1" in req and "StepName" not in req["Step1"]:
-        raise RuntimeError("Request Step1 missing StepName")
+    Yield the job masks WMCore's EventBased splitter would create for a single
+    MCFakeFile, without building DataStructs jobs/groups.
 
-    # Pick the Step1 / Production entry from the splitting JSON
-    prod_split = None
-    for entry in splitting_info:
-        if entry["taskType"] == "Production":
-            prod_split = entry
-            break
-    if prod_split is None:
-        raise RuntimeError("No Production split entry found in splitting JSON")
-
-    split_algo = prod_split["splitAlgo"]           # "EventBased"
-    split_params = prod_split["splitParams"]       # contains events_per_job, events_per_lumi, etc.
+    Mirrors the MCFakeFile branch of WMCore.JobSplitting.EventBased.algorithm
+    (including the uint32 event-number wrap) and JobFactory.newJob, which sets
+    FirstRun = LastRun = 1 on every job.
+    """
+    events_per_job = int(events_per_job)
+    events_per_lumi = int(events_per_lumi)
+    if events_per_job <= 0 or events_per_lumi <= 0:
+        raise RuntimeError("events_per_job and events_per_lumi must be positive. Their values are: "
+                           "events_per_job: %d, events_per_lumi: %d" % (events_per_job, events_per_lumi))
+    uint32_max = 2 ** 32 - 1
+    lumis_per_job = int(math.ceil(float(events_per_job) / events_per_lumi))
+    current_event = first_event
+    current_lumi = first_lumi
+    events_left = total_events
+    while events_left > 0:
+        if (current_event + events_per_job - 1) > uint32_max and (current_event + events_left) > uint32_max:
+            current_event = 1
+        if events_left >= events_per_job:
+            n_events = events_per_job
+        else:
+            n_events = events_left
+            lumis_per_job = int(math.ceil(float(events_left) / events_per_lumi))
+        yield {
+            "inclusivemask": True,
+            "FirstEvent": current_event,
+            "LastEvent": current_event + n_events - 1,
+            "FirstLumi": current_lumi,
+            "LastLumi": current_lumi + lumis_per_job - 1,
+            "FirstRun": 1,
+            "LastRun": 1,
+            "runAndLumis": {},
+        }
+        events_left -= events_per_job
+        current_event += events_per_job
+        current_lumi += lumis_per_job
+
+
+def wmcore_job_masks(req, prod_split):
+    """
+    Run the Production split through WMCore's SplitterFactory on an in-memory
+    subscription for Step1 and return the job masks as plain dicts.
+    """
+    split_algo = prod_split["splitAlgo"]
+    split_params = prod_split["splitParams"]
 
     # Build fileset and subscription for Step1
     step_key = "Step1"
@@ -255,17 +333,11 @@ def generate_eventbased_jobs(request_json_path, splitting_json_path):
         performance=performance,
     )
 
-    # Flatten jobs and precompute PSetTweak JSON per job per step (consumed by edm_pset_tweak on the worker).
-    # Output: job_index + tweaks only (no mask; worker uses precomputed tweaks).
-    num_steps = req.get("StepChain", 1)
-    step1_num_copies = req.get("Step1", {}).get("NumCopies", 1)
-    job_cpus = max(1, int(req.get("Multicore", 1)))
-    jobs_out = []
-    job_id = 1
+    masks = []
     for group in job_groups:
         for job in group.jobs:
             mask = job["mask"]
-            mask_dict = {
+            masks.append({
                 "inclusivemask": mask.get("inclusivemask", True),
                 "FirstEvent": mask["FirstEvent"],
                 "LastEvent": mask["LastEvent"],
@@ -274,77 +346,132 @@ def generate_eventbased_jobs(request_json_path, splitting_json_path):
                 "FirstRun": mask["FirstRun"],
                 "LastRun": mask["LastRun"],
                 "runAndLumis": mask.get("runAndLumis", {}),
-            }
-            tweaks = {}
-            for step_num in range(1, num_steps + 1):
-                step_key_cur = "Step%d" % step_num
-                step_config = req.get(step_key_cur, {})
-                # Per-step EventStreams overrides workload-level (matches WMCore StepChain)
-                event_streams = step_config.get("EventStreams")
-                if event_streams is None:
-                    event_streams = req.get("EventStreams", 0)
-                event_streams = int(event_streams) if event_streams is not None else 0
-
-                next_step_key = "Step%d" % (step_num + 1)
-                set_output_filename = None
-                output_module_name = None
-                if step_num < num_steps:
-                    next_config = req.get(next_step_key, {})
-                    output_module_name = next_config.get("InputFromOutputModule", "RAWSIMoutput")
-                    set_output_filename = "file:%s.root" % output_module_name
-                # Step 2+ read from previous step; path is relative to stepN/ dir (../step(N-1)/OutputModule.root)
-                chain_input_file = None
-                chain_input_files = None
-                if step_num > 1:
-                    prev_output_module = step_config.get("InputFromOutputModule", "RAWSIMoutput")
-                    if step_num == 2 and step1_num_copies > 1:
-                        chain_input_files = [
-                            "file:../step1/copy%d/%s.root" % (i, prev_output_module)
-                            for i in range(step1_num_copies)
-                        ]
-                    else:
-                        chain_input_file = "file:../step%d/%s.root" % (step_num - 1, prev_output_module)
-
-                if step_num == 1 and step1_num_copies > 1:
-                    # Step 1 with num_copies > 1: produce one tweak per copy (split event interval)
-                    first_event = mask_dict.get("FirstEvent", 0)
-                    last_event = mask_dict.get("LastEvent", 0)
-                    total = last_event - first_event + 1
-                    per_copy = total // step1_num_copies
-                    remainder = total % step1_num_copies
-                    step1_tweaks = []
-                    base = first_event
-                    for copy_idx in range(step1_num_copies):
-                        count = per_copy + (1 if copy_idx < remainder else 0)
-                        copy_mask = mask_dict.copy()
-                        copy_mask["FirstEvent"] = base
-                        copy_mask["LastEvent"] = base + count - 1
-                        base += count
-                        copy_tweak = build_job_tweak_json(
-                            copy_mask,
-                            lhe_input=split_params.get("lheInputFiles", False),
-                            chain_input_file=None,
-                            chain_input_files=None,
-                            set_output_filename=set_output_filename,
-                            output_module_name=output_module_name,
-                            num_threads=1,  # each copy runs as separate process, 1 thread per copy
-                            event_streams=event_streams,
-                        )
-                        step1_tweaks.append(copy_tweak)
-                    tweaks[str(step_num)] = step1_tweaks
-                else:
-                    tweaks[str(step_num)] = build_job_tweak_json(
-                        mask_dict,
-                        lhe_input=split_params.get("lheInputFiles", False),
-                        chain_input_file=chain_input_file,
-                        chain_input_files=chain_input_files,
-                        set_output_filename=set_output_filename,
-                        output_module_name=output_module_name,
-                        num_threads=job_cpus,  # single cmsRun per step, use all job CPUs
-                        event_streams=event_streams,
-                    )
-            jobs_out.append({"job_index": job_id, "tweaks": tweaks})
-            job_id += 1
+            })
+    return masks
+
+
+def generate_eventbased_jobs(request_json_path, splitting_json_path):
+    """
+    High-level driver:
+      - read request + splitting docs
+      - compute the Step1 production job masks: directly for plain EventBased MC
+        (see eventbased_mc_masks), otherwise via WMCore's SplitterFactory
+      - return a flat list of job dicts, each with job_index and tweaks
+        (PSetTweak JSON per step for edm_pset_tweak on the worker; a list,
+        tweaks[0] is step 1).
+    """
+    req = load_json(request_json_path)
+    splitting_info = load_json(splitting_json_path)
+
+    # Require main request keys for a stepchain
+    for key in ("Step1", "StepChain", "TimePerEvent", "Memory", "PrepID"):
+        if key not in req:
+            raise RuntimeError("Request JSON missing required key: %s" % key)
+    if "Step1" in req and "StepName" not in req["Step1"]:
+        raise RuntimeError("Request Step1 missing StepName")
+
+    # Index the splitting entries by taskType (the first entry of each type wins,
+    # hence reversed) and pick the Step1 / Production one
+    splitters_by_type = {entry["taskType"]: entry for entry in reversed(splitting_info)}
+    prod_split = splitters_by_type.get("Production")
+    if prod_split is None:
+        raise RuntimeError("No Production split entry found in splitting JSON")
+
+    split_algo = prod_split["splitAlgo"]           # "EventBased"
+    split_params = prod_split["splitParams"]       # contains events_per_job, events_per_lumi, etc.
+
+    if split_algo == "EventBased" and not split_params.get("collectionName") \
+            and not split_params.get("include_parents", False):
+        # Plain MC production (no ACDC, no parents): the masks only depend on a
+        # few integers, so compute them directly instead of going through
+        # SplitterFactory and materialising WMCore job objects.
+        step1 = req["Step1"]
+        masks = eventbased_mc_masks(
+            first_event=req.get("FirstEvent", 1),
+            total_events=step1["RequestNumEvents"],
+            first_lumi=req.get("FirstLumi", 1),
+            events_per_job=split_params["events_per_job"],
+            events_per_lumi=split_params["events_per_lumi"],
+        )
+    else:
+        masks = wmcore_job_masks(req, prod_split)
+
+    # Flatten jobs and precompute PSetTweak JSON per job per step (consumed by edm_pset_tweak on the worker).
+    # Output: job_index + tweaks only (no mask; worker uses precomputed tweaks).
+    num_steps = req.get("StepChain", 1)
+    step1_num_copies = req.get("Step1", {}).get("NumCopies", 1)
+    job_cpus = max(1, int(req.get("Multicore", 1)))
+
+    # The step configuration is the same for every job: build the job-independent
+    # (head, tail) tweak parts once per step; only the mask part changes per job.
+    step_parts = []
+    for step_num in range(1, num_steps + 1):
+        step_key_cur = "Step%d" % step_num
+        step_config = req.get(step_key_cur, {})
+        # Per-step EventStreams overrides workload-level (matches WMCore StepChain)
+        event_streams = step_config.get("EventStreams")
+        if event_streams is None:
+            event_streams = req.get("EventStreams", 0)
+        event_streams = int(event_streams) if event_streams is not None else 0
+
+        next_step_key = "Step%d" % (step_num + 1)
+        set_output_filename = None
+        output_module_name = None
+        if step_num < num_steps:
+            next_config = req.get(next_step_key, {})
+            output_module_name = next_config.get("InputFromOutputModule", "RAWSIMoutput")
+            set_output_filename = "file:%s.root" % output_module_name
+        # Step 2+ read from previous step; path is relative to stepN/ dir (../step(N-1)/OutputModule.root)
+        chain_input_file = None
+        chain_input_files = None
+        if step_num > 1:
+            prev_output_module = step_config.get("InputFromOutputModule", "RAWSIMoutput")
+            if step_num == 2 and step1_num_copies > 1:
+                chain_input_files = [
+                    "file:../step1/copy%d/%s.root" % (i, prev_output_module)
+                    for i in range(step1_num_copies)
+                ]
+            else:
+                chain_input_file = "file:../step%d/%s.root" % (step_num - 1, prev_output_module)
+
+        step_parts.append(build_step_tweak_parts(
+            chain_input_file=chain_input_file,
+            chain_input_files=chain_input_files,
+            set_output_filename=set_output_filename,
+            output_module_name=output_module_name,
+            # Step 1 copies run as separate processes, 1 thread per copy;
+            # otherwise a single cmsRun per step uses all job CPUs
+            num_threads=1 if step_num == 1 and step1_num_copies > 1 else job_cpus,
+            event_streams=event_streams,
+        ))
+
+    jobs_out = []
+    job_id = 1
+    for mask_dict in masks:
+        mask_tweak = build_mask_tweak(mask_dict)
+        tweaks = [None] * num_steps
+        for step_num, (head, tail) in enumerate(step_parts, start=1):
+            if step_num == 1 and step1_num_copies > 1:
+                # Step 1 with num_copies > 1: produce one tweak per copy (split event interval)
+                first_event = mask_dict.get("FirstEvent", 0)
+                last_event = mask_dict.get("LastEvent", 0)
+                total = last_event - first_event + 1
+                per_copy = total // step1_num_copies
+                remainder = total % step1_num_copies
+                step1_tweaks = []
+                base = first_event
+                for copy_idx in range(step1_num_copies):
+                    count = per_copy + (1 if copy_idx < remainder else 0)
+                    copy_mask = mask_dict.copy()
+                    copy_mask["FirstEvent"] = base
+                    copy_mask["LastEvent"] = base + count - 1
+                    base += count
+                    step1_tweaks.append({**head, **build_mask_tweak(copy_mask), **tail})
+                tweaks[step_num - 1] = step1_tweaks
+            else:
+                tweaks[step_num - 1] = {**head, **mask_tweak, **tail}
+        jobs_out.append({"job_index": job_id, "tweaks": tweaks})
+        job_id += 1
 
     return jobs_out
 
@@ -353,34 +480,108 @@ def parse_args():
     parser = argparse.ArgumentParser(
         description="Standalone EventBased splitter using WMCore DataStructs only. "
         "With --output-dir, writes job1.json..jobN.json (per job) and, if --psets is given, "
-        "request_psets.tar.gz (request.json from --request + PSets/) for the worker.",
+        "request_psets.tar[.gz|.zst] (request.json from --request + PSets/) for the worker.",
     )
     parser.add_argument("--request", required=True, help="Path to ReqMgr-style request JSON")
     parser.add_argument("--splitting", required=True, help="Path to splitting JSON")
     parser.add_argument("--output-dir", help="Directory for job1..jobN.json and request_psets.tar.gz (put PSets/ here for tarball)")
     parser.add_argument("--psets", help="Path to PSets directory to include in request_psets.tar.gz")
-    return parser.parse_args()
+    parser.add_argument(
+        "--indent",
+        dest="indent",
+        action="store_true",
+        help="Indent jobN.json files by 2 spaces (human-readable, slower to write)",
+    )
+    parser.add_argument(
+        "--no-indent",
+        dest="indent",
+        action="store_false",
+        help="Write compact jobN.json files (default)",
+    )
+    parser.set_defaults(indent=False)
+    parser.add_argument(
+        "--compression",
+        choices=sorted(TARBALL_SUFFIXES),
+        default="gzip",
+        help="Compression of the request_psets tarball: none (.tar), gzip (.tar.gz, default) "
+        "or zstd (.tar.zst, needs the zstandard module here and zstd on the worker)",
+    )
+    args = parser.parse_args()
+    if args.compression == "zstd" and zstandard is None:
+        parser.error("--compression zstd requires the zstandard module")
+    return args
+
+
+def write_request_tarball(tarball_path, request_path, psets_path, compression="gzip"):
+    """
+    Write request.json + PSets/ to tarball_path using the given compression (see TARBALL_SUFFIXES).
 
+    request_psets tarballs with the other suffixes next to it are removed first, so a
+    reused output dir never leaves a stale one for create_stepchain_jdl to pick up.
+    """
+    base = tarball_path[:-len(TARBALL_SUFFIXES[compression])]
+    for suffix in TARBALL_SUFFIXES.values():
+        if base + suffix != tarball_path and os.path.exists(base + suffix):
+            os.remove(base + suffix)
+    if compression == "zstd":
+        # Stream the tar through a multi-threaded zstd compressor
+        cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+        with open(tarball_path, "wb") as fh, cctx.stream_writer(fh) as zfh:
+            with tarfile.open(fileobj=zfh, mode="w|") as tf:
+                tf.add(request_path, arcname="request.json")
+                tf.add(psets_path, arcname="PSets")
+    else:
+        with tarfile.open(tarball_path, "w:gz" if compression == "gzip" else "w") as tf:
+            tf.add(request_path, arcname="request.json")
+            tf.add(psets_path, arcname="PSets")
 
-def write_jobs_to_output_dir(output_dir, request_path, jobs, psets_path=None):
-    """Write per-job JSON files and optionally request_psets.tar.gz to output_dir."""
+
+def dump_job(job, indent=False):
+    """Serialize a job dict to JSON bytes (orjson if available), optionally indented by 2."""
+    if orjson is not None:
+        return orjson.dumps(job, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(job, indent=2).encode()
+    return json.dumps(job, separators=(",", ":")).encode()
+
+
+def write_job_files(output_dir, jobs, indent=False):
+    """
+    Write one jobN.json per job into output_dir.
+
+    Files are created relative to a directory fd with raw os.open/os.write/os.close,
+    i.e. three syscalls per file and no path lookup or Python file object per job.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_CLOEXEC", 0)
+    dir_fd = os.open(output_dir, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        for job in jobs:
+            data = memoryview(dump_job(job, indent=indent))
+            fd = os.open("job%d.json" % job["job_index"], flags, 0o644, dir_fd=dir_fd)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
+    finally:
+        os.close(dir_fd)
+
+
+def write_jobs_to_output_dir(output_dir, request_path, jobs, psets_path=None, compression="gzip",
+                             indent=False):
+    """Write per-job JSON files and optionally request_psets.tar[.gz|.zst] to output_dir."""
     os.makedirs(output_dir, exist_ok=True)
 
     # Per-job JSON: job1.json, job2.json, ... (each has job_index + tweaks)
-    for job in jobs:
-        job_index = job["job_index"]
-        with open(os.path.join(output_dir, "job%d.json" % job_index), "w") as f:
-            json.dump(job, f, indent=2)
+    write_job_files(output_dir, jobs, indent=indent)
 
     # Tarball with request.json + PSets/ for the worker (only when --psets is given)
-    tarball_path = os.path.join(output_dir, "request_psets.tar.gz")
+    tarball_name = "request_psets" + TARBALL_SUFFIXES[compression]
     if psets_path is not None and os.path.isdir(psets_path):
-        with tarfile.open(tarball_path, "w:gz") as tf:
-            tf.add(request_path, arcname="request.json")
-            tf.add(psets_path, arcname="PSets")
-        print(f"Generated {len(jobs)} jobs: job1..job{len(jobs)}.json, request_psets.tar.gz in {output_dir}")
+        write_request_tarball(os.path.join(output_dir, tarball_name), request_path, psets_path, compression)
+        print(f"Generated {len(jobs)} jobs: job1..job{len(jobs)}.json, {tarball_name} in {output_dir}")
     else:
-        print(f"Generated {len(jobs)} jobs: job1..job{len(jobs)}.json in {output_dir} (no --psets, skipped request_psets.tar.gz)")
+        print(f"Generated {len(jobs)} jobs: job1..job{len(jobs)}.json in {output_dir} (no --psets, skipped {tarball_name})")
 
 
 if __name__ == "__main__":
@@ -389,7 +590,10 @@ if __name__ == "__main__":
     jobs = generate_eventbased_jobs(args.request, args.splitting)
 
     if args.output_dir:
-        write_jobs_to_output_dir(args.output_dir, args.request, jobs, psets_path=args.psets)
+        write_jobs_to_output_dir(
+            args.output_dir, args.request, jobs, psets_path=args.psets,
+            compression=args.compression, indent=args.indent,
+        )
     else:
         print(f"Created {len(jobs)} jobs")
         for j in jobs[:5]:
@@ -0,0 +1,21 @@
+"""
+Process-wide cache for parsed request.json files.
+
+create_stepchain_jdl and generate_pileupconf both read the same request.json when
+driven from one process; load_request parses it once and hands back the same dict
+until the file's mtime changes. Callers must treat the returned dict as read-only.
+"""
+import functools
+import os
+
+from micro_agent.utils import load_json
+
+
+@functools.lru_cache(maxsize=4)
+def _load(path, mtime):
+    return load_json(path)
+
+
+def load_request(path):
+    """Return the parsed request.json at path, cached on (path, mtime)."""
+    return _load(os.path.abspath(path), os.path.getmtime(path))
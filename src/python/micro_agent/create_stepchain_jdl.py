@@ -17,12 +17,23 @@ Usage:
     --sitelist sitelist.txt
 """
 import argparse
-import json
+import functools
+import itertools
 import math
 import os
+import sys
+
+# src/python is not on sys.path when this file is run as a script
+_python_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _python_dir not in sys.path:
+    sys.path.insert(0, _python_dir)
+from micro_agent._request_cache import load_request
 
 DEFAULT_REQUIRED_OS = "rhel7"
 
+# request_psets tarball names written by event_splitter (--compression), default first
+REQUEST_TARBALL_NAMES = ("request_psets.tar.gz", "request_psets.tar.zst", "request_psets.tar")
+
 # ScramArch prefix -> HTCondor REQUIRED_OS (mirrors WMCore WMRuntime.Tools.Scram.ARCH_TO_OS)
 ARCH_TO_OS = {
     "slc5": ["rhel6"],
@@ -36,28 +47,84 @@ ARCH_TO_OS = {
     "cs9": ["rhel9"],
 }
 
+# Every REQUIRED_OS combination reachable from ARCH_TO_OS, pre-joined in sorted order
+_KNOWN_OS = sorted(set(itertools.chain.from_iterable(ARCH_TO_OS.values())))
+_REQUIRED_OS_STRINGS = {
+    frozenset(combo): ",".join(combo)
+    for size in range(1, len(_KNOWN_OS) + 1)
+    for combo in itertools.combinations(_KNOWN_OS, size)
+}
+
+# Retry on a different machine than the last one the job ran on
+RETRY_REQUIREMENTS = (
+    "( (LastRemoteHost =?= undefined) || "
+    "(TARGET.Machine =!= split(LastRemoteHost, \"@\")[1]) )"
+)
+
+# JDL written by write_jdl_file (str.format placeholders; $(...) are HTCondor macros)
+_JDL_TEMPLATE = """Universe   = vanilla
+
+Executable = {executable}
+
+Log        = log/run.$(Cluster)
+Output     = out/run.$(Cluster).$(Process).$$([NumJobCompletions])
+Error      = err/run.$(Cluster).$(Process).$$([NumJobCompletions])
+
+should_transfer_files = YES
+when_to_transfer_output = ON_EXIT
+transfer_input_files = run.sh,execute_stepchain.sh,submit_env.sh,stage_out.py,create_report.py,WMCore.zip,utils.py,{event_splitter_dir}/job$(Index).json,{event_splitter_dir}/{tarball_name}
+transfer_output_files = output.tgz, job_report.json, prmon.txt, prmon.json
+transfer_output_remaps = "output.tgz = results/output.$(Cluster).$(Process).$$([NumJobCompletions]).tgz; job_report.json = results/job_report.$(Cluster).$(Process).$$([NumJobCompletions]).json; prmon.txt = results/prmon.$(Cluster).$(Process).$$([NumJobCompletions]).txt; prmon.json = results/prmon.$(Cluster).$(Process).$$([NumJobCompletions]).json"
+
+{batch_line}x509userproxy = {proxy_path}
+use_x509userproxy = True
+
++DESIRED_Sites = "{sites_str}"
+
+request_cpus = {request_cpus}
+request_memory = {request_memory}
++MaxWallTimeMins = {walltime_mins}
+max_idle = 100
+
++REQUIRED_OS = "{required_os}"
+
+# Retry on different machine when run.sh fails (CERN batch docs pattern)
+on_exit_remove = (ExitBySignal == False) && (ExitCode == 0)
+max_retries = {max_retries}
+requirements = {retry_requirements}
+
+Queue Index from seq 1 {num_jobs} |
+"""
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve_required_os(scram_archs):
+    """REQUIRED_OS string for a tuple of ScramArchs (cached: the same few lists recur)."""
+    required = set()
+    for arch in scram_archs:
+        prefix = arch.split("_")[0]
+        required.update(ARCH_TO_OS.get(prefix, []))
+    if not required:
+        return "any"
+    return _REQUIRED_OS_STRINGS[frozenset(required)]
+
 
 def scram_arch_to_required_os(scram_arch=None):
     """Map ScramArch (or list) to HTCondor REQUIRED_OS. Mirrors WMCore BasePlugin.scramArchtoRequiredOS."""
     if not scram_arch:
         return "any"
     if isinstance(scram_arch, str):
-        scram_arch = [scram_arch]
-    elif not isinstance(scram_arch, (list, tuple)):
+        return _resolve_required_os((scram_arch,))
+    if not isinstance(scram_arch, (list, tuple)):
         return "any"
-    required = set()
-    for arch in scram_arch:
-        prefix = arch.split("_")[0]
-        required.update(ARCH_TO_OS.get(prefix, []))
-    return ",".join(sorted(required)) if required else "any"
+    return _resolve_required_os(tuple(scram_arch))
 
 
 def read_request(request_path):
     """Read request.json and extract job params. Returns dict or None."""
     if not request_path or not os.path.isfile(request_path):
         return None
-    with open(request_path) as f:
-        req = json.load(f)
+    req = load_request(request_path)
     step1 = req.get("Step1", {})
     request_num_events = step1.get("RequestNumEvents")
     events_per_job = step1.get("EventsPerJob")
@@ -82,18 +149,33 @@ def read_request(request_path):
     }
 
 
+def find_request_tarball(event_splitter_dir):
+    """
+    Return the name of the request_psets tarball in event_splitter_dir (request_psets.tar.gz
+    if none found). If several are present, the most recently written one wins.
+    """
+    found = []
+    for priority, name in enumerate(REQUEST_TARBALL_NAMES):
+        path = os.path.join(event_splitter_dir, name)
+        if os.path.isfile(path):
+            found.append((os.stat(path).st_mtime_ns, -priority, name))
+    if not found:
+        return REQUEST_TARBALL_NAMES[0]
+    return max(found)[2]
+
+
 def read_sitelist(sitelist_path):
     """Read sitelist file and return comma-separated sites string."""
     if not os.path.isfile(sitelist_path):
         raise SystemExit(f"Error: sitelist file not found: {sitelist_path}")
 
     with open(sitelist_path) as f:
-        sites = [line.strip() for line in f if line.strip()]
+        sites_str = ", ".join(filter(None, (line.strip() for line in f)))
 
-    if not sites:
+    if not sites_str:
         raise SystemExit(f"Error: sitelist file is empty: {sitelist_path}")
 
-    return ", ".join(sites)
+    return sites_str
 
 
 def write_jdl_file(
@@ -109,50 +191,28 @@ def write_jdl_file(
     request_memory=1000,
     walltime_mins=180,
     required_os="rhel7",
+    tarball_name="request_psets.tar.gz",
 ):
     """Write the HTCondor JDL file."""
-    retry_requirements = (
-        "( (LastRemoteHost =?= undefined) || "
-        "(TARGET.Machine =!= split(LastRemoteHost, \"@\")[1]) )"
-    )
-
     batch_line = f'JobBatchName = "{batch_name}"\n\n' if batch_name else ""
 
-    content = f"""Universe   = vanilla
-
-Executable = {executable}
-
-Log        = log/run.$(Cluster)
-Output     = out/run.$(Cluster).$(Process).$$([NumJobCompletions])
-Error      = err/run.$(Cluster).$(Process).$$([NumJobCompletions])
-
-should_transfer_files = YES
-when_to_transfer_output = ON_EXIT
-transfer_input_files = run.sh,execute_stepchain.sh,submit_env.sh,stage_out.py,create_report.py,WMCore.zip,utils.py,{event_splitter_dir}/job$(Index).json,{event_splitter_dir}/request_psets.tar.gz
-transfer_output_files = output.tgz, job_report.json, prmon.txt, prmon.json
-transfer_output_remaps = "output.tgz = results/output.$(Cluster).$(Process).$$([NumJobCompletions]).tgz; job_report.json = results/job_report.$(Cluster).$(Process).$$([NumJobCompletions]).json; prmon.txt = results/prmon.$(Cluster).$(Process).$$([NumJobCompletions]).txt; prmon.json = results/prmon.$(Cluster).$(Process).$$([NumJobCompletions]).json"
-
-{batch_line}x509userproxy = {proxy_path}
-use_x509userproxy = True
-
-+DESIRED_Sites = "{sites_str}"
-
-request_cpus = {request_cpus}
-request_memory = {request_memory}
-+MaxWallTimeMins = {walltime_mins}
-max_idle = 100
-
-+REQUIRED_OS = "{required_os}"
-
-# Retry on different machine when run.sh fails (CERN batch docs pattern)
-on_exit_remove = (ExitBySignal == False) && (ExitCode == 0)
-max_retries = {max_retries}
-requirements = {retry_requirements}
-
-Queue Index from seq 1 {num_jobs} |
-"""
-    with open(output_path, "w") as f:
-        f.write(content)
+    content = _JDL_TEMPLATE.format(
+        executable=executable,
+        event_splitter_dir=event_splitter_dir,
+        tarball_name=tarball_name,
+        batch_line=batch_line,
+        proxy_path=proxy_path,
+        sites_str=sites_str,
+        request_cpus=request_cpus,
+        request_memory=request_memory,
+        walltime_mins=walltime_mins,
+        required_os=required_os,
+        max_retries=max_retries,
+        retry_requirements=RETRY_REQUIREMENTS,
+        num_jobs=num_jobs,
+    )
+    with open(output_path, "wb", buffering=64 * 1024) as f:
+        f.write(content.encode())
 
 
 def parse_args():
@@ -163,7 +223,7 @@ def parse_args():
     parser.add_argument(
         "--event-splitter-dir",
         required=True,
-        help="Path to event_splitter output dir (job1.json, job2.json, ..., request_psets.tar.gz)",
+        help="Path to event_splitter output dir (job1.json, job2.json, ..., request_psets.tar[.gz|.zst])",
     )
     parser.add_argument(
         "--request",
@@ -237,6 +297,7 @@ def main():
         request_memory=request_memory,
         walltime_mins=walltime_mins,
         required_os=required_os,
+        tarball_name=find_request_tarball(args.event_splitter_dir),
     )
 
     print(f"Generated JDL with {num_jobs} jobs: {args.output_jdl}")
@@ -39,6 +39,13 @@ ULOG_JOB_ABORTED = 9
 ULOG_JOB_EVICTED = 4
 ULOG_JOB_AD = 28
 
+# Event header: NNN (Cluster.Proc.Subproc) YYYY-MM-DD HH:MM:SS message
+_EVENT_HEADER_RE = re.compile(
+    r"^(\d{3})\s+\((\d+)\.(\d+)\.(\d+)\)\s+(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})\s+(.*)$"
+)
+# Job ad attribute: Key = Value
+_KEY_VALUE_RE = re.compile(r"^(\w+)\s*=\s*(.*)$")
+
 
 class CondorLogParser:
     """
@@ -57,10 +64,11 @@ class CondorLogParser:
         Parse a condor user log event header line.
         Returns (event_code, cluster, proc, subproc, timestamp_str, message) or None.
         """
-        m = re.match(
-            r"^(\d{3})\s+\((\d+)\.(\d+)\.(\d+)\)\s+(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})\s+(.*)$",
-            line,
-        )
+        # Most log lines are event bodies or job ad attributes: reject them on the
+        # leading event code before running the regex.
+        if not line[:3].isdigit():
+            return None
+        m = _EVENT_HEADER_RE.match(line)
         if not m:
             return None
         return (
@@ -75,7 +83,9 @@ class CondorLogParser:
     @staticmethod
     def _parse_key_value(line):
         """Parse 'Key = Value' line. Returns (key, val) or None."""
-        kv = re.match(r"^(\w+)\s*=\s*(.*)$", line.strip())
+        if "=" not in line:
+            return None
+        kv = _KEY_VALUE_RE.match(line.strip())
         if not kv:
             return None
         key, val = kv.group(1), kv.group(2).strip()
@@ -1,12 +1,38 @@
 """
 Utility functions for the micro_agent workflow.
-Includes LFN (Logical File Name) building used by stage_out.py and micro_agent_monitor.py.
+Includes LFN (Logical File Name) building used by stage_out.py and micro_agent_monitor.py,
+and the load_json helper shared with event_splitter, create_stepchain_jdl and generate_pileupconf.
 
 Canonical source. Copy to submission directory (alongside stage_out.py) before condor_submit.
 """
 import json
+import mmap
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Below this size a plain read() is cheaper than setting up an mmap
+JSON_MMAP_MIN_SIZE = 16 * 1024
+
+
+def load_json(path):
+    """
+    Load a JSON file. With orjson, large files are parsed straight from an mmap of the
+    file (no intermediate str); otherwise falls back to json.load.
+    Decode errors are ValueError (json.JSONDecodeError) in both cases.
+    """
+    with open(path, "rb") as f:
+        if orjson is None:
+            return json.load(f)
+        if os.fstat(f.fileno()).st_size < JSON_MMAP_MIN_SIZE:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
 
 def build_lfn(base, era, primary, proc, out_module):
     """
@@ -46,9 +72,8 @@ def load_step_config(request_path, step_name):
     if not request_path or not os.path.isfile(request_path):
         return None
     try:
-        with open(request_path) as f:
-            req = json.load(f)
-    except (json.JSONDecodeError, OSError):
+        req = load_json(request_path)
+    except (ValueError, OSError):
         return None
     if not step_name.startswith("step") or len(step_name) < 5 or not step_name[4:].isdigit():
         return None
@@ -31,7 +31,32 @@ Usage examples:
 import argparse
 import json
 import logging
+import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import requests
+    import urllib3
+except ImportError:
+    requests = None
+
+# src/python is not on sys.path when this file is run as a script
+_python_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _python_dir not in sys.path:
+    sys.path.insert(0, _python_dir)
+from micro_agent._request_cache import load_request
 
 # ---------------------------------------------------------------------------
 # Instance presets
@@ -60,34 +85,143 @@ PILEUP_FIELD_MAP = {
 
 RUCIO_ACCOUNT = "wmcore_pileup"
 
+# CA directory used to verify the CMS web services when talking to them directly
+# (WMCore default when X509_CERT_DIR is not set; includes the CERN Grid CA)
+GRID_CA_DIR = "/etc/grid-security/certificates"
+
+# Upper bound for datasets queried concurrently (DBS + MSPileup + Rucio per dataset)
+MAX_DATASET_WORKERS = 8
+
+# Connection pool sizing for the keep-alive HTTP sessions (one session per worker thread)
+HTTP_POOL_CONNECTIONS = 8
+HTTP_POOL_MAXSIZE = 16
+
+# Per-thread HTTP session and WMCore service clients (reused across datasets)
+_thread_local = threading.local()
+
 
 # ---------------------------------------------------------------------------
 # Service query helpers
 # ---------------------------------------------------------------------------
+def _grid_credentials():
+    """
+    ``(key, cert)`` paths for direct HTTPS calls, looked up exactly like the WMCore
+    clients (host cert, X509_USER_PROXY, X509_USER_KEY/CERT, /tmp/x509up_u<uid>, ~/.globus).
+    """
+    from Utils.CertTools import getKeyCertFromEnv
+
+    return getKeyCertFromEnv()
+
+
+def _http_session():
+    """
+    Return this thread's ``requests.Session``, creating it on first use.
+
+    The session keeps TLS connections alive between calls, so repeated queries
+    against the same service skip the handshake. Sessions are not shared across
+    threads; each worker of ``generate_pileupconf`` gets its own pool.
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                                                pool_maxsize=HTTP_POOL_MAXSIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        key, cert = _grid_credentials()
+        if key and cert:
+            session.cert = (cert, key)
+        session.verify = os.environ.get("X509_CERT_DIR") or GRID_CA_DIR
+        _thread_local.session = session
+    return session
+
+
+def _dbs_reader(dbs_url):
+    """Return this thread's WMCore DBSReader for dbs_url, creating it on first use."""
+    readers = getattr(_thread_local, "dbs_readers", None)
+    if readers is None:
+        readers = _thread_local.dbs_readers = {}
+    reader = readers.get(dbs_url)
+    if reader is None:
+        from WMCore.Services.DBS.DBSReader import DBSReader
+
+        reader = readers[dbs_url] = DBSReader(dbs_url)
+    return reader
+
+
+def _rucio_client(rucio_auth_url, rucio_host_url):
+    """Return this thread's WMCore Rucio client for the given endpoints, creating it on first use."""
+    clients = getattr(_thread_local, "rucio_clients", None)
+    if clients is None:
+        clients = _thread_local.rucio_clients = {}
+    key = (rucio_auth_url, rucio_host_url)
+    client = clients.get(key)
+    if client is None:
+        from WMCore.Services.Rucio.Rucio import Rucio
+
+        client = clients[key] = Rucio(RUCIO_ACCOUNT,
+                                      authUrl=rucio_auth_url,
+                                      hostUrl=rucio_host_url)
+    return client
+
+
+def _stream_dbs_files(dbs_url, dataset):
+    """
+    Yield the valid files of a dataset from the DBS ``files`` API (detail=True),
+    parsing the response incrementally with ijson instead of loading it whole.
+    """
+    url = "%s/files" % dbs_url.rstrip("/")
+    params = {"dataset": dataset, "detail": 1, "validFileOnly": 1}
+    with _http_session().get(url, params=params, headers={"Accept": "application/json"},
+                             stream=True, timeout=300) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        yield from ijson.items(resp.raw, "item")
+
+
+def _group_files_by_block(files):
+    """Group DBS file records by block; returns ``(block_dict, file_count)``."""
+    block_dict = {}
+    block_get = block_dict.get
+    file_count = 0
+    for file_info in files:
+        block_name = file_info["block_name"]
+        entry = block_get(block_name)
+        if entry is None:
+            entry = {"FileList": [], "NumberOfEvents": 0, "PhEDExNodeNames": []}
+            block_dict[block_name] = entry
+        entry["FileList"].append(file_info["logical_file_name"])
+        entry["NumberOfEvents"] += file_info["event_count"]
+        file_count += 1
+    return block_dict, file_count
+
+
 def query_dbs(dbs_url, dataset):
     """
     Query DBS for file-level detail and organise results by block.
 
+    With ``requests`` and ``ijson`` installed, the file list is streamed from the DBS
+    REST API; otherwise, or if that query fails (SSL, auth, network, or a response
+    cut short or not valid JSON), it is fetched in one go through WMCore's DBSReader.
+
     Returns a dict:
         {block_name: {"FileList": [lfn, ...],
                       "NumberOfEvents": int,
                       "PhEDExNodeNames": []}}
     """
-    from WMCore.Services.DBS.DBSReader import DBSReader
-
     logging.info("Querying DBS at %s for dataset %s", dbs_url, dataset)
-    dbs_reader = DBSReader(dbs_url)
-
-    block_dict = {}
-    file_count = 0
-    for file_info in dbs_reader.getFileListByDataset(dataset=dataset, detail=True):
-        block_name = file_info["block_name"]
-        block_dict.setdefault(block_name, {"FileList": [],
-                                           "NumberOfEvents": 0,
-                                           "PhEDExNodeNames": []})
-        block_dict[block_name]["FileList"].append(file_info["logical_file_name"])
-        block_dict[block_name]["NumberOfEvents"] += file_info["event_count"]
-        file_count += 1
+    result = None
+    if requests is not None and ijson is not None:
+        try:
+            result = _group_files_by_block(_stream_dbs_files(dbs_url, dataset))
+        # Errors while reading the body come from urllib3 and ijson, not requests
+        except (requests.RequestException, urllib3.exceptions.HTTPError, ijson.JSONError) as exc:
+            logging.warning("Streaming DBS query for %s failed (%s); retrying with DBSReader",
+                            dataset, exc)
+    if result is None:
+        files = _dbs_reader(dbs_url).getFileListByDataset(dataset=dataset, detail=True)
+        result = _group_files_by_block(files)
+    block_dict, file_count = result
 
     logging.info("Found %d blocks in DBS for dataset %s with %d files",
                  len(block_dict), dataset, file_count)
@@ -121,6 +255,21 @@ def query_mspileup(mspileup_url, dataset):
     return doc
 
 
+def _iter_container_blocks(rucio, container, scope):
+    """
+    Yield the block names of a Rucio container.
+
+    Same result as ``Rucio.getBlocksInContainer`` but consumes the client's
+    ``list_content`` generator directly instead of building a list first.
+    """
+    if not rucio.isContainer(container, scope=scope):
+        logging.warning("Provided DID name is not a CONTAINER type: %s", container)
+        return
+    for item in rucio.cli.list_content(scope=scope, name=container):
+        if item["type"].upper() == "DATASET":
+            yield item["name"]
+
+
 def filter_blocks_with_rucio(block_dict, dataset, ms_doc, rucio_auth_url, rucio_host_url):
     """
     Use Rucio to verify which blocks actually exist in the container and
@@ -137,25 +286,22 @@ def filter_blocks_with_rucio(block_dict, dataset, ms_doc, rucio_auth_url, rucio_
         container = custom_name
         scope = "group.wmcore"
 
-    from WMCore.Services.Rucio.Rucio import Rucio
-
     logging.info("Querying Rucio (auth=%s, host=%s) for container %s, scope=%s",
                  rucio_auth_url, rucio_host_url, container, scope)
 
-    rucio = Rucio(RUCIO_ACCOUNT,
-                  authUrl=rucio_auth_url,
-                  hostUrl=rucio_host_url)
-    rucio_blocks = rucio.getBlocksInContainer(container=container, scope=scope)
+    rucio = _rucio_client(rucio_auth_url, rucio_host_url)
+    # Containers can hold thousands of blocks: check membership against a set
+    rucio_blocks = set(_iter_container_blocks(rucio, container, scope))
     logging.info("Found %d blocks in Rucio container %s (scope=%s)",
                  len(rucio_blocks), container, scope)
 
     current_rses = ms_doc.get("currentRSEs", [])
-    for block_name in list(block_dict):
-        if block_name not in rucio_blocks:
-            logging.warning("Block %s present in DBS but not in Rucio -- removing.", block_name)
-            block_dict.pop(block_name)
-        else:
-            block_dict[block_name]["PhEDExNodeNames"] = current_rses
+    to_remove = [block_name for block_name in block_dict if block_name not in rucio_blocks]
+    for block_name in to_remove:
+        logging.warning("Block %s present in DBS but not in Rucio -- removing.", block_name)
+        block_dict.pop(block_name)
+    for block_info in block_dict.values():
+        block_info["PhEDExNodeNames"] = current_rses
 
     logging.info("Final pileup for %s: %d blocks after Rucio filtering.", dataset, len(block_dict))
 
@@ -163,6 +309,19 @@ def filter_blocks_with_rucio(block_dict, dataset, ms_doc, rucio_auth_url, rucio_
 # ---------------------------------------------------------------------------
 # High-level driver
 # ---------------------------------------------------------------------------
+def _process_dataset(dataset, dbs_url, mspileup_url, rucio_auth_url, rucio_host_url):
+    """
+    Run the DBS -> MSPileup -> Rucio chain for a single pileup dataset.
+
+    Returns the ``{block_name: {...}}`` dict for that dataset.
+    """
+    ds_blocks = query_dbs(dbs_url, dataset)
+    ms_doc = query_mspileup(mspileup_url, dataset)
+    filter_blocks_with_rucio(ds_blocks, dataset, ms_doc,
+                             rucio_auth_url, rucio_host_url)
+    return ds_blocks
+
+
 def generate_pileupconf(datasets_by_type, dbs_url, mspileup_url,
                         rucio_auth_url, rucio_host_url):
     """
@@ -178,55 +337,82 @@ def generate_pileupconf(datasets_by_type, dbs_url, mspileup_url,
         ``{pileupType: {blockName: {"FileList": [...], "NumberOfEvents": N,
                                     "PhEDExNodeNames": [RSEs]}}}``
     """
-    result = {}
-    for pu_type, datasets in datasets_by_type.items():
-        block_dict = {}
-        for dataset in datasets:
-            ds_blocks = query_dbs(dbs_url, dataset)
-            ms_doc = query_mspileup(mspileup_url, dataset)
-            filter_blocks_with_rucio(ds_blocks, dataset, ms_doc,
-                                     rucio_auth_url, rucio_host_url)
-            block_dict.update(ds_blocks)
-        result[pu_type] = block_dict
+    result = {pu_type: {} for pu_type in datasets_by_type}
+    tasks = [(pu_type, dataset)
+             for pu_type, datasets in datasets_by_type.items()
+             for dataset in datasets]
+    if not tasks:
+        return result
+
+    # Datasets are independent: query them concurrently so the service round-trips
+    # overlap, then merge in input order so the output does not depend on timing.
+    with ThreadPoolExecutor(max_workers=min(MAX_DATASET_WORKERS, len(tasks))) as executor:
+        futures = [executor.submit(_process_dataset, dataset, dbs_url, mspileup_url,
+                                   rucio_auth_url, rucio_host_url)
+                   for _, dataset in tasks]
+        try:
+            for (pu_type, _), future in zip(tasks, futures):
+                result[pu_type].update(future.result())
+        except Exception:
+            # The run fails anyway: drop the datasets not started yet instead of
+            # querying DBS, MSPileup and Rucio for them before re-raising
+            for future in futures:
+                future.cancel()
+            raise
     return result
 
 
 # ---------------------------------------------------------------------------
 # request.json extraction
 # ---------------------------------------------------------------------------
+def _iter_request_steps(req):
+    """
+    Yield the StepN (StepChain) or TaskN (TaskChain) dicts of a request.
+
+    When the request carries a ``StepChain``/``TaskChain`` count only those keys
+    are looked up; otherwise steps are scanned from 1 until the first gap.
+    """
+    for chain_key, prefix in (("StepChain", "Step"), ("TaskChain", "Task")):
+        count = req.get(chain_key)
+        if count:
+            for step_num in range(1, count + 1):
+                step = req.get(f"{prefix}{step_num}")
+                if step is not None:
+                    yield step
+            return
+
+    step_num = 1
+    while True:
+        step = req.get(f"Step{step_num}")
+        if step is None:
+            step = req.get(f"Task{step_num}")
+        if step is None:
+            return
+        yield step
+        step_num += 1
+
+
 def extract_pileup_from_request(request_path):
     """
     Scan StepN entries in a request.json for MCPileup / DataPileup fields.
 
     Returns a dict ``{pileup_type: [dataset, ...]}`` aggregated across all steps.
     """
-    with open(request_path) as fh:
-        req = json.load(fh)
+    req = load_request(request_path)
 
     datasets_by_type = {}
-    # Iterate over Step1, Step2, ... up to StepChain count (or a reasonable upper bound)
-    max_steps = req.get("StepChain", req.get("TaskChain", 20))
-    for step_num in range(1, max_steps + 1):
-        step_key = f"Step{step_num}"
-        step = req.get(step_key)
-        if step is None:
-            # also try TaskN for TaskChain workflows
-            step_key = f"Task{step_num}"
-            step = req.get(step_key)
-        if step is None:
-            continue
-
+    for step in _iter_request_steps(req):
         for field, pu_type in PILEUP_FIELD_MAP.items():
             ds = step.get(field)
             if ds:
-                datasets_by_type.setdefault(pu_type, [])
-                if ds not in datasets_by_type[pu_type]:
-                    datasets_by_type[pu_type].append(ds)
+                # dict keys act as an insertion-ordered set for the dedupe
+                datasets_by_type.setdefault(pu_type, {})[ds] = None
 
     if not datasets_by_type:
         raise RuntimeError(
             f"No MCPileup or DataPileup fields found in any step of {request_path}"
         )
+    datasets_by_type = {pu_type: list(datasets) for pu_type, datasets in datasets_by_type.items()}
 
     logging.info("Extracted pileup datasets from %s: %s", request_path, datasets_by_type)
     return datasets_by_type
@@ -348,8 +534,12 @@ def main(argv=None):
     )
 
     # Write output
-    with open(args.output, "w") as fh:
-        json.dump(pileup_conf, fh, indent=2)
+    if orjson is not None:
+        data = orjson.dumps(pileup_conf, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(pileup_conf, indent=2).encode()
+    with open(args.output, "wb") as fh:
+        fh.write(data)
 
     # Summary
     total_blocks = sum(len(blocks) for blocks in pileup_conf.values())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for micro_agent.create_stepchain_jdl.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+# Add src/python to path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+
+from micro_agent.create_stepchain_jdl import find_request_tarball, scram_arch_to_required_os
+
+
+class TestScramArchToRequiredOS(unittest.TestCase):
+    """Tests for scram_arch_to_required_os."""
+
+    def test_single_arch(self):
+        self.assertEqual(scram_arch_to_required_os("slc7_amd64_gcc700"), "rhel7")
+        self.assertEqual(scram_arch_to_required_os("el9_amd64_gcc12"), "rhel9")
+
+    def test_list_of_archs(self):
+        self.assertEqual(
+            scram_arch_to_required_os(["el9_amd64_gcc12", "slc7_amd64_gcc700", "cs8_amd64_gcc10"]),
+            "rhel7,rhel8,rhel9",
+        )
+        self.assertEqual(scram_arch_to_required_os(("slc6_amd64_gcc530", "slc5_amd64_gcc462")), "rhel6")
+
+    def test_unknown_or_empty(self):
+        self.assertEqual(scram_arch_to_required_os(None), "any")
+        self.assertEqual(scram_arch_to_required_os([]), "any")
+        self.assertEqual(scram_arch_to_required_os("foo_amd64_gcc1"), "any")
+        self.assertEqual(scram_arch_to_required_os(42), "any")
+
+    def test_repeated_calls(self):
+        archs = ["slc7_amd64_gcc700", "el8_amd64_gcc11"]
+        self.assertEqual(scram_arch_to_required_os(archs), scram_arch_to_required_os(list(archs)))
+        self.assertEqual(scram_arch_to_required_os(archs), "rhel7,rhel8")
+
+
+class TestFindRequestTarball(unittest.TestCase):
+    """Tests for find_request_tarball."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _touch(self, name, mtime):
+        path = os.path.join(self.tmpdir, name)
+        open(path, "w").close()
+        os.utime(path, (mtime, mtime))
+
+    def test_default_when_missing(self):
+        self.assertEqual(find_request_tarball(self.tmpdir), "request_psets.tar.gz")
+
+    def test_newest_tarball_wins(self):
+        self._touch("request_psets.tar.gz", 1000)
+        self._touch("request_psets.tar.zst", 2000)
+        self.assertEqual(find_request_tarball(self.tmpdir), "request_psets.tar.zst")
+        self._touch("request_psets.tar.gz", 3000)
+        self.assertEqual(find_request_tarball(self.tmpdir), "request_psets.tar.gz")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for job_splitters.event_splitter (skipped when WMCore is not importable).
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+# Add src/python and the bundled WMCore.zip to path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "samples", "htcondor", "WMCore.zip"))
+
+try:
+    from job_splitters import event_splitter
+except ImportError:
+    event_splitter = None
+
+
+class TestWriteRequestTarball(unittest.TestCase):
+    """Tests for write_request_tarball."""
+
+    def setUp(self):
+        if event_splitter is None:
+            self.skipTest("WMCore not importable")
+        self.tmpdir = tempfile.mkdtemp()
+        self.request_path = os.path.join(self.tmpdir, "request.json")
+        with open(self.request_path, "w") as f:
+            f.write("{}")
+        self.psets_path = os.path.join(self.tmpdir, "PSets")
+        os.mkdir(self.psets_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_removes_superseded_tarballs(self):
+        out_dir = os.path.join(self.tmpdir, "out")
+        os.mkdir(out_dir)
+        for name in ("request_psets.tar.gz", "request_psets.tar.zst"):
+            open(os.path.join(out_dir, name), "w").close()
+
+        event_splitter.write_request_tarball(os.path.join(out_dir, "request_psets.tar"),
+                                             self.request_path, self.psets_path, compression="none")
+        self.assertEqual(os.listdir(out_dir), ["request_psets.tar"])
+
+
+class TestEventBasedMCMasks(unittest.TestCase):
+    """eventbased_mc_masks must produce the same masks as WMCore's EventBased splitter."""
+
+    def setUp(self):
+        if event_splitter is None:
+            self.skipTest("WMCore not importable")
+
+    def _assert_same_masks(self, total_events, events_per_job, events_per_lumi,
+                           first_event=1, first_lumi=1, run_number=1):
+        req = {
+            "PrepID": "TST-00001",
+            "RequestName": "tst_request",
+            "TimePerEvent": 10,
+            "SizePerEvent": 100,
+            "Memory": 2000,
+            "FirstEvent": first_event,
+            "FirstLumi": first_lumi,
+            "RunNumber": run_number,
+            "Step1": {
+                "StepName": "GEN",
+                "RequestNumEvents": total_events,
+                "EventsPerLumi": events_per_lumi,
+            },
+        }
+        prod_split = {
+            "taskType": "Production",
+            "splitAlgo": "EventBased",
+            "splitParams": {"events_per_job": events_per_job, "events_per_lumi": events_per_lumi},
+        }
+        expected = event_splitter.wmcore_job_masks(req, prod_split)
+        masks = list(event_splitter.eventbased_mc_masks(
+            first_event=first_event,
+            total_events=total_events,
+            first_lumi=first_lumi,
+            events_per_job=events_per_job,
+            events_per_lumi=events_per_lumi,
+        ))
+        self.assertTrue(expected)
+        self.assertEqual(masks, expected)
+
+    def test_one_lumi_per_job(self):
+        self._assert_same_masks(total_events=8300, events_per_job=830, events_per_lumi=830)
+
+    def test_remainder_in_last_job(self):
+        self._assert_same_masks(total_events=10007, events_per_job=1000, events_per_lumi=300)
+
+    def test_first_event_lumi_and_run_overrides(self):
+        self._assert_same_masks(total_events=5000, events_per_job=700, events_per_lumi=700,
+                                first_event=123456, first_lumi=42, run_number=7)
+
+    def test_uint32_event_wrap(self):
+        self._assert_same_masks(total_events=5000, events_per_job=1000, events_per_lumi=500,
+                                first_event=2 ** 32 - 2500)
+
+
+if __name__ == "__main__":
+    unittest.main()
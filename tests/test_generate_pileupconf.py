@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for pileup_generator.generate_pileupconf (request.json extraction, DBS query fallback,
+dataset fan-out).
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Add src/python to path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+
+from pileup_generator import generate_pileupconf
+from pileup_generator.generate_pileupconf import extract_pileup_from_request
+
+
+class TestExtractPileupFromRequest(unittest.TestCase):
+    """Tests for extract_pileup_from_request."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write_request(self, req):
+        path = os.path.join(self.tmpdir, "request.json")
+        with open(path, "w") as f:
+            json.dump(req, f)
+        return path
+
+    def test_stepchain_dedupes_in_order(self):
+        path = self._write_request({
+            "StepChain": 3,
+            "Step1": {"MCPileup": "/MinBias/A/GEN-SIM"},
+            "Step2": {"MCPileup": "/MinBias/B/GEN-SIM", "DataPileup": "/Neutrino/C/PREMIX"},
+            "Step3": {"MCPileup": "/MinBias/A/GEN-SIM"},
+        })
+        self.assertEqual(extract_pileup_from_request(path), {
+            "mc": ["/MinBias/A/GEN-SIM", "/MinBias/B/GEN-SIM"],
+            "data": ["/Neutrino/C/PREMIX"],
+        })
+
+    def test_chain_count_limits_steps(self):
+        path = self._write_request({
+            "TaskChain": 1,
+            "Task1": {"MCPileup": "/MinBias/A/GEN-SIM"},
+            "Task2": {"MCPileup": "/MinBias/B/GEN-SIM"},
+        })
+        self.assertEqual(extract_pileup_from_request(path), {"mc": ["/MinBias/A/GEN-SIM"]})
+
+    def test_without_chain_count_stops_at_first_gap(self):
+        path = self._write_request({
+            "Step1": {"MCPileup": "/MinBias/A/GEN-SIM"},
+            "Step3": {"MCPileup": "/MinBias/B/GEN-SIM"},
+        })
+        self.assertEqual(extract_pileup_from_request(path), {"mc": ["/MinBias/A/GEN-SIM"]})
+
+    def test_no_pileup_raises(self):
+        path = self._write_request({"StepChain": 1, "Step1": {"StepName": "GEN"}})
+        with self.assertRaises(RuntimeError):
+            extract_pileup_from_request(path)
+
+
+class _ForbiddenHandler(BaseHTTPRequestHandler):
+    """DBS stand-in that rejects every request, like a server refusing the proxy."""
+
+    def do_GET(self):
+        self.send_response(403)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _TruncatedHandler(BaseHTTPRequestHandler):
+    """DBS stand-in that drops the connection partway through a 200 response."""
+
+    def do_GET(self):
+        body = b'[{"block_name": "/MinBias/A/GEN-SIM#1", "logical_file_name": "/store/a.root"'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body) + 1000))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeDBSReader:
+    def getFileListByDataset(self, dataset, detail):
+        return [
+            {"block_name": dataset + "#1", "logical_file_name": "/store/a.root", "event_count": 10},
+            {"block_name": dataset + "#1", "logical_file_name": "/store/b.root", "event_count": 5},
+        ]
+
+
+class TestQueryDbsFallback(unittest.TestCase):
+    """query_dbs falls back to DBSReader when the streamed query fails."""
+
+    def setUp(self):
+        if generate_pileupconf.requests is None or generate_pileupconf.ijson is None:
+            self.skipTest("requests/ijson not installed")
+        self.saved = (generate_pileupconf._grid_credentials, generate_pileupconf._dbs_reader)
+        generate_pileupconf._grid_credentials = lambda: (None, None)
+        generate_pileupconf._dbs_reader = lambda url: _FakeDBSReader()
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        generate_pileupconf._grid_credentials, generate_pileupconf._dbs_reader = self.saved
+
+    def _serve(self, handler):
+        server = HTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return "http://127.0.0.1:%d/dbs" % server.server_port
+
+    def _assert_dbsreader_blocks(self, blocks):
+        self.assertEqual(blocks, {
+            "/MinBias/A/GEN-SIM#1": {"FileList": ["/store/a.root", "/store/b.root"],
+                                     "NumberOfEvents": 15,
+                                     "PhEDExNodeNames": []},
+        })
+
+    def test_http_error_falls_back_to_dbsreader(self):
+        url = self._serve(_ForbiddenHandler)
+        self._assert_dbsreader_blocks(generate_pileupconf.query_dbs(url, "/MinBias/A/GEN-SIM"))
+
+    def test_truncated_stream_falls_back_to_dbsreader(self):
+        url = self._serve(_TruncatedHandler)
+        self._assert_dbsreader_blocks(generate_pileupconf.query_dbs(url, "/MinBias/A/GEN-SIM"))
+
+
+class TestGeneratePileupconf(unittest.TestCase):
+    """Tests for generate_pileupconf."""
+
+    def setUp(self):
+        self.saved = (generate_pileupconf._process_dataset, generate_pileupconf.MAX_DATASET_WORKERS)
+
+    def tearDown(self):
+        generate_pileupconf._process_dataset, generate_pileupconf.MAX_DATASET_WORKERS = self.saved
+
+    def test_failure_cancels_pending_datasets(self):
+        processed = []
+
+        def fail_first(dataset, *urls):
+            processed.append(dataset)
+            if dataset == "/MinBias/D0/GEN-SIM":
+                raise RuntimeError("DBS query failed")
+            time.sleep(0.2)
+            return {}
+
+        generate_pileupconf._process_dataset = fail_first
+        generate_pileupconf.MAX_DATASET_WORKERS = 1
+        datasets = {"mc": ["/MinBias/D%d/GEN-SIM" % i for i in range(10)]}
+        with self.assertRaises(RuntimeError):
+            generate_pileupconf.generate_pileupconf(datasets, "dbs", "mspileup", "auth", "host")
+        # The worker may already have picked up the next dataset; the rest are cancelled
+        self.assertEqual(processed[0], "/MinBias/D0/GEN-SIM")
+        self.assertLessEqual(len(processed), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -40,6 +40,16 @@ class TestCondorLogParser(unittest.TestCase):
         self.assertIsNone(CondorLogParser.parse_event("not an event"))
         self.assertIsNone(CondorLogParser.parse_event(""))
 
+    def test_parse_event_non_header_lines(self):
+        self.assertIsNone(CondorLogParser.parse_event("\t(1) Normal termination (return value 0)"))
+        self.assertIsNone(CondorLogParser.parse_event("12 (10409446.0.0) 2025-02-26 10:30:00 x"))
+        self.assertIsNone(CondorLogParser.parse_event("..."))
+
+    def test_parse_key_value(self):
+        self.assertEqual(CondorLogParser._parse_key_value('JOB_Site = "T3_US_FNALLPC"'),
+                         ("JOB_Site", "T3_US_FNALLPC"))
+        self.assertIsNone(CondorLogParser._parse_key_value("\tUsr 0 00:00:00, Sys 0 00:00:00"))
+
     def test_iter_events(self):
         log_content = """005 (10409446.0.0) 2025-02-26 10:30:00 Job terminated.
 ReturnValue = 0
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Tests for ep_scripts/stage_out.py, mostly with a fake StageOutMgr (skipped when WMCore is not importable).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import zlib
+
+# stage_out.py runs from the job sandbox with utils.py next to it and WMCore.zip on the path
+import sys
+_repo = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(_repo, "ep_scripts"))
+sys.path.insert(1, os.path.join(_repo, "src", "python", "micro_agent"))
+sys.path.append(os.path.join(_repo, "samples", "htcondor", "WMCore.zip"))
+
+try:
+    import stage_out
+except ImportError:
+    stage_out = None
+
+
+class FakeStageOutMgr:
+    """
+    Stand-in for WMCore StageOutMgr: records calls, sleeps delays[LFN] seconds and
+    fails the first failures[LFN] calls for that LFN.
+    """
+    instances = []
+    delays = {}
+    failures = {}
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.override = False
+        self.overrideConf = {}
+        self.stageOuts_rfcs = [({"command": "gfal2", "option": None}, None)]
+        self.completedFiles = {}
+        self.failed = {}
+        self.calls = []
+        self.cleaned = False
+        with self.lock:
+            FakeStageOutMgr.instances.append(self)
+
+    def __call__(self, fileToStage):
+        lfn = fileToStage["LFN"]
+        self.calls.append((lfn, self.stageOuts_rfcs[0][0]["option"]))
+        time.sleep(self.delays.get(lfn, 0))
+        with self.lock:
+            remaining = self.failures.get(lfn, 0)
+            if remaining:
+                self.failures[lfn] = remaining - 1
+                raise RuntimeError("transfer of %s failed" % lfn)
+        result = dict(fileToStage, PFN="davs://se.example" + lfn, PNN="T2_XX_Test",
+                      StageOutCommand="gfal2")
+        self.completedFiles[lfn] = result
+        return result
+
+    def cleanSuccessfulStageOuts(self):
+        self.cleaned = True
+
+
+class StageOutTestCase(unittest.TestCase):
+    def setUp(self):
+        if stage_out is None:
+            self.skipTest("WMCore not importable")
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved_mgr = stage_out.StageOutMgr
+        stage_out.StageOutMgr = FakeStageOutMgr
+        del stage_out._manager_pool[:]
+        FakeStageOutMgr.instances = []
+        FakeStageOutMgr.delays = {}
+        FakeStageOutMgr.failures = {}
+
+    def tearDown(self):
+        stage_out.StageOutMgr = self.saved_mgr
+        del stage_out._manager_pool[:]
+        shutil.rmtree(self.tmpdir)
+
+    def _file_list(self, count):
+        file_list = []
+        for i in range(count):
+            path = os.path.join(self.tmpdir, "out%d.root" % i)
+            with open(path, "wb") as f:
+                f.write(b"x" * (i + 1))
+            file_list.append({"lfn": "/store/unmerged/test/out%d.root" % i, "local_path": path})
+        return file_list
+
+    def _stageout(self, file_list, **kwargs):
+        kwargs.setdefault("retry_base", 0)
+        kwargs.setdefault("retry_jitter", 0)
+        return stage_out.stageout_files(file_list, **kwargs)
+
+
+class TestStageoutFiles(StageOutTestCase):
+    """Tests for stageout_files."""
+
+    def test_results_in_input_order(self):
+        file_list = self._file_list(4)
+        # Later files finish first
+        for i, fi in enumerate(file_list):
+            FakeStageOutMgr.delays[fi["lfn"]] = 0.05 * (4 - i)
+        staged = self._stageout(file_list, workers=4)
+        self.assertEqual([r["LFN"] for r in staged], [fi["lfn"] for fi in file_list])
+        self.assertTrue(all(r["PNN"] == "T2_XX_Test" for r in staged))
+
+    def test_failure_cleans_up_every_manager(self):
+        file_list = self._file_list(3)
+        for fi in file_list:
+            FakeStageOutMgr.delays[fi["lfn"]] = 0.1
+        FakeStageOutMgr.failures[file_list[1]["lfn"]] = 1
+        with self.assertRaises(RuntimeError):
+            self._stageout(file_list, workers=3, retries=0)
+        self.assertGreater(len(FakeStageOutMgr.instances), 1)
+        self.assertTrue(all(m.cleaned for m in FakeStageOutMgr.instances))
+        # Managers go back to the pool for the next call
+        self.assertEqual(len(stage_out._manager_pool), len(FakeStageOutMgr.instances))
+
+    def test_managers_reused_across_calls(self):
+        file_list = self._file_list(2)
+        self._stageout(file_list, workers=1)
+        self._stageout(file_list, workers=1)
+        self.assertEqual(len(FakeStageOutMgr.instances), 1)
+
+    def test_retry_count(self):
+        file_list = self._file_list(1)
+        lfn = file_list[0]["lfn"]
+        FakeStageOutMgr.failures[lfn] = 2
+        staged = self._stageout(file_list, retries=2)
+        self.assertEqual(staged[0]["LFN"], lfn)
+        self.assertEqual(len(FakeStageOutMgr.instances[0].calls), 3)
+
+        FakeStageOutMgr.failures[lfn] = 5
+        with self.assertRaises(RuntimeError):
+            self._stageout(file_list, retries=1)
+        self.assertEqual(len(FakeStageOutMgr.instances[0].calls), 3 + 2)
+
+    def test_failure_stops_pending_retries(self):
+        file_list = self._file_list(1)
+        retrying = file_list[0]["lfn"]
+        FakeStageOutMgr.failures[retrying] = 1
+        # Checksumming a missing file fails this one without any retry
+        file_list.append({"lfn": "/store/unmerged/test/missing.root",
+                          "local_path": os.path.join(self.tmpdir, "missing.root")})
+        start = time.time()
+        with self.assertRaises(OSError):
+            self._stageout(file_list, workers=2, retries=3, retry_base=60,
+                           compute_cksum="adler32")
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(len(FakeStageOutMgr.instances[0].calls), 1)
+
+    def test_failure_stops_prepared_transfers(self):
+        file_list = self._file_list(3)
+        FakeStageOutMgr.failures[file_list[0]["lfn"]] = 1
+        # A single worker: the other files are prepared but not started when the first fails
+        with self.assertRaises(RuntimeError):
+            self._stageout(file_list, workers=1, retries=0)
+        self.assertEqual(FakeStageOutMgr.instances[0].calls, [(file_list[0]["lfn"], None)])
+
+    def test_parallel_streams_fall_back_to_single_stream(self):
+        file_list = self._file_list(1)
+        lfn = file_list[0]["lfn"]
+        FakeStageOutMgr.failures[lfn] = 1
+        saved_min_size = stage_out.PARALLEL_MIN_SIZE
+        stage_out.PARALLEL_MIN_SIZE = 0
+        try:
+            staged = self._stageout(file_list, retries=0, parallel_parts=4)
+        finally:
+            stage_out.PARALLEL_MIN_SIZE = saved_min_size
+        self.assertEqual(staged[0]["LFN"], lfn)
+        manager = FakeStageOutMgr.instances[0]
+        self.assertEqual(manager.calls, [(lfn, "--nbstreams 4"), (lfn, None)])
+        # The manager's own stage-out definitions are restored
+        self.assertIsNone(manager.stageOuts_rfcs[0][0]["option"])
+
+
+class TestWMCoreStageOutImpl(StageOutTestCase):
+    """Runs a real WMCore override 'cp' StageOutMgr instead of the fake one."""
+
+    def test_failed_attempt_does_not_sleep_in_wmcore(self):
+        manager = self.saved_mgr(**{"command": "cp", "option": None, "phedex-node": "T2_XX_Test",
+                                    "lfn-prefix": os.path.join(self.tmpdir, "se")})
+        stage_out._manager_pool.append(manager)
+        file_list = [{"lfn": "/store/unmerged/test/missing.root",
+                      "local_path": os.path.join(self.tmpdir, "missing.root")}]
+        logging.disable(logging.CRITICAL)
+        try:
+            # Only StageOutImpl's own time module is replaced, not subprocess's
+            with mock.patch("WMCore.Storage.StageOutImpl.time") as impl_time:
+                with self.assertRaises(Exception):
+                    self._stageout(file_list, retries=0)
+        finally:
+            logging.disable(logging.NOTSET)
+        # StageOutImpl sleeps retryPause after the failed attempt: it must be zero
+        self.assertTrue(impl_time.sleep.called)
+        self.assertEqual([c.args[0] for c in impl_time.sleep.call_args_list if c.args[0]], [])
+
+
+class TestDiscoverFiles(StageOutTestCase):
+    """Tests for discover_files_from_request."""
+
+    def test_last_step_skips_non_regular_matches(self):
+        request_path = os.path.join(self.tmpdir, "request.json")
+        with open(request_path, "w") as f:
+            json.dump({"StepChain": 1, "Step1": {"KeepOutput": True}}, f)
+        step_dir = os.path.join(self.tmpdir, "step1")
+        os.makedirs(os.path.join(step_dir, "AODSIMoutput.root"))
+        os.symlink(os.path.join(self.tmpdir, "gone.root"), os.path.join(step_dir, "MINIAODSIMoutput.root"))
+        found = stage_out.discover_files_from_request(request_path, self.tmpdir)
+        self.assertEqual(found, [])
+
+        open(os.path.join(step_dir, "NANOAODSIMoutput.root"), "w").close()
+        found = stage_out.discover_files_from_request(request_path, self.tmpdir)
+        self.assertEqual([fi["local_path"] for fi in found],
+                         [os.path.join(step_dir, "NANOAODSIMoutput.root")])
+
+
+class TestHelpers(StageOutTestCase):
+    """Tests for backoff_delay and compute_checksum."""
+
+    def test_backoff_delay(self):
+        self.assertEqual(stage_out.backoff_delay(0, base=30, cap=1800, jitter=0), 30)
+        self.assertEqual(stage_out.backoff_delay(3, base=30, cap=1800, jitter=0), 240)
+        self.assertEqual(stage_out.backoff_delay(10, base=30, cap=1800, jitter=0), 1800)
+        for attempt in range(5):
+            delay = stage_out.backoff_delay(attempt, base=1, cap=4, jitter=2)
+            self.assertGreaterEqual(delay, min(4, 2 ** attempt))
+            self.assertLessEqual(delay, min(4, 2 ** attempt) + 2)
+
+    def test_compute_checksum(self):
+        data = os.urandom(100000)
+        path = os.path.join(self.tmpdir, "data.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        saved_chunk = stage_out.CKSUM_CHUNK_SIZE
+        stage_out.CKSUM_CHUNK_SIZE = 4096  # several chunks
+        try:
+            self.assertEqual(stage_out.compute_checksum(path, "adler32"), "%08x" % zlib.adler32(data))
+            self.assertEqual(stage_out.compute_checksum(path, "md5"), hashlib.md5(data).hexdigest())
+        finally:
+            stage_out.CKSUM_CHUNK_SIZE = saved_chunk
+
+    def test_compute_checksum_adler32_is_zero_padded(self):
+        path = os.path.join(self.tmpdir, "empty.bin")
+        open(path, "wb").close()
+        self.assertEqual(stage_out.compute_checksum(path, "adler32"), "00000001")
+
+
+if __name__ == "__main__":
+    unittest.main()